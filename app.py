@@ -1,8 +1,10 @@
 from fastapi import FastAPI, Query, Depends, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy import select
 from pydantic import BaseModel
 import json
 from datetime import datetime
@@ -10,26 +12,29 @@ import openai
 from dotenv import load_dotenv
 import os
 
-from database import engine, get_db
+from database import engine, get_db, migrate_schema
 from llm_service import llm_service
 from vector_store import vector_store
 from icd_service import icd_service
 
-from models import Base as BaseModel, Document
+from models import Document
 from schemas import (
     DocumentCreate, 
     Document as DocumentSchema, 
     SummarizationResponse,
     SearchQuery,
     SearchResult,
+    BatchSearchQuery,
+    BatchSearchResult,
     QuestionRequest,
     QuestionResponse,
     StructuredExtraction
 )
 
+EXPORT_CHUNK_SIZE = 1000  # Rows fetched per query when streaming the document export
 
-# Create database tables
-BaseModel.metadata.create_all(bind=engine)
+# Create database tables and add any new columns
+migrate_schema(engine)
 
 app = FastAPI(
     title="Medical Workflow Automation",
@@ -67,7 +72,13 @@ def create_document(document: DocumentCreate, db: Session = Depends(get_db)):
     """
     Create a new document.
     """
-    db_document = Document(title=document.title, content=document.content)
+    db_document = Document(
+        title=document.title,
+        content=document.content,
+        patient_id=document.patient_id,
+        encounter_date=document.encounter_date,
+        note_type=document.note_type
+    )
     db.add(db_document)
     db.commit()
     db.refresh(db_document)
@@ -87,13 +98,52 @@ async def summarize_note(document: DocumentCreate):
     return SummarizationResponse(summary=summary)
 
 @app.get("/documents/", response_model=List[DocumentSchema])
-def read_documents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_documents(
+    after_id: Optional[int] = None,
+    limit: int = 100,
+    skip: int = 0,
+    db: Session = Depends(get_db)
+):
     """
-    Retrieve a list of documents.
+    Retrieve a list of documents ordered by ID.
+    Pass the ID of the last document received as after_id to get the next page;
+    this seeks straight to it through the primary key, unlike skip, which
+    has to walk past every skipped row.
     """
-    documents = db.query(Document).offset(skip).limit(limit).all()
+    if after_id is not None and skip:
+        raise HTTPException(status_code=400, detail="Use either after_id or skip, not both")
+    query = db.query(Document).order_by(Document.id)
+    if after_id is not None:
+        query = query.filter(Document.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    documents = query.limit(limit).all()
     return documents
 
+@app.get("/documents/export")
+def export_documents():
+    """
+    Stream all documents as newline-delimited JSON.
+    Rows are read in keyset-paginated chunks without building ORM objects,
+    so memory use stays flat regardless of table size.
+    """
+    def generate():
+        table = Document.__table__
+        last_id = None
+        with engine.connect() as connection:
+            while True:
+                query = select(table).order_by(table.c.id).limit(EXPORT_CHUNK_SIZE)
+                if last_id is not None:
+                    query = query.where(table.c.id > last_id)
+                rows = connection.execute(query).mappings().all()
+                if not rows:
+                    break
+                for row in rows:
+                    yield json.dumps(dict(row), default=str) + "\n"
+                last_id = rows[-1]["id"]
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.get("/documents/{document_id}", response_model=DocumentSchema)
 def read_document(document_id: int, db: Session = Depends(get_db)):
     """
@@ -105,21 +155,34 @@ def read_document(document_id: int, db: Session = Depends(get_db)):
     return document
 
 @app.post("/search/", response_model=List[SearchResult])
-async def search_documents(query: SearchQuery):
+def search_documents(query: SearchQuery):
     """
     Search for similar documents using semantic search.
     """
-    results = vector_store.search(query.query, k=query.k)
+    results = vector_store.search(query.query, k=query.k, **query.filters.model_dump())
     return results
 
+@app.post("/search/batch/", response_model=List[BatchSearchResult])
+def search_documents_batch(request: BatchSearchQuery):
+    """
+    Search for similar documents for several queries at once using semantic search.
+    """
+    results = vector_store.search_batch(request.queries, k=request.k, **request.filters.model_dump())
+    return [
+        BatchSearchResult(query=query, results=matches)
+        for query, matches in zip(request.queries, results)
+    ]
+
 @app.post("/answer_question/", response_model=QuestionResponse)
 async def answer_question(request: QuestionRequest):
     """
     Answer a question using relevant documents and LLM.
     """
     try:
-        # Get relevant documents using vector search
-        relevant_docs = vector_store.search(request.question, k=request.k)
+        # Get relevant documents using vector search, off the event loop since embedding blocks
+        relevant_docs = await run_in_threadpool(
+            vector_store.search, request.question, k=request.k, **request.filters.model_dump()
+        )
         
         if not relevant_docs:
             return QuestionResponse(
@@ -0,0 +1,190 @@
+import os
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import numpy as np
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+OPENAI_EMBEDDING_BATCH_SIZE = 2048  # Maximum number of inputs per OpenAI embeddings request
+OPENAI_EMBEDDING_TOKEN_BUDGET = 250000  # Stay under the API's 300k total tokens per request
+OPENAI_CHARS_PER_TOKEN = 3  # Conservative estimate; clinical abbreviations tokenize densely
+
+class EmbeddingProvider(ABC):
+    """Interface for turning texts into embedding vectors."""
+
+    model_name: str
+    dimension: int
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed several texts.
+
+        Args:
+            texts (List[str]): The texts to embed
+
+        Returns:
+            np.ndarray: A float32 matrix of shape (len(texts), dimension), in input order
+        """
+
+    def close(self):
+        """Release any resources held for bulk embedding. The provider stays usable."""
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API."""
+
+    def __init__(self, model_name: str = "text-embedding-3-small", dimension: int = 1536):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        self.client = OpenAI(api_key=api_key)
+        self.model_name = model_name
+        self.dimension = dimension
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, batching them into as few API calls as the request limits allow."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # Only text-embedding-3 models accept a requested output dimension
+        options = {"dimensions": self.dimension} if self.model_name.startswith("text-embedding-3") else {}
+
+        embeddings = []
+        for batch in self._batches(texts):
+            response = self.client.embeddings.create(
+                model=self.model_name,
+                input=batch,
+                **options
+            )
+            # The API may not return items in input order, so sort by index
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        # No reshape, so a dimension mismatch surfaces in the returned shape
+        return np.array(embeddings, dtype=np.float32)
+
+    @staticmethod
+    def _batches(texts: List[str]):
+        """Split texts into requests that fit both the input count and the token limits."""
+        batch: List[str] = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = len(text) // OPENAI_CHARS_PER_TOKEN + 1
+            if batch and (len(batch) == OPENAI_EMBEDDING_BATCH_SIZE or batch_tokens + tokens > OPENAI_EMBEDDING_TOKEN_BUDGET):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+# Model loaded once in each worker process of LocalEmbeddingProvider's pool
+_worker_model = None
+
+def _load_sentence_transformer(model_name: str, backend: str, num_threads: Optional[int] = None):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError(
+            "The local embedding provider requires sentence-transformers. "
+            "Install it with: pip install sentence-transformers"
+        )
+    model_kwargs = None
+    if num_threads is not None:
+        if backend == "onnx":
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = num_threads
+            session_options.inter_op_num_threads = 1
+            model_kwargs = {"session_options": session_options}
+        else:
+            import torch
+            torch.set_num_threads(num_threads)
+    return SentenceTransformer(model_name, device="cpu", backend=backend, model_kwargs=model_kwargs)
+
+def _init_worker(model_name: str, backend: str, num_threads: int):
+    global _worker_model
+    _worker_model = _load_sentence_transformer(model_name, backend, num_threads)
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from a sentence-transformers model run on the local CPU.
+
+    Small inputs such as search queries are encoded in this process to keep
+    latency low. Larger inputs such as index builds are split into batches
+    and spread across a pool of worker processes, each holding its own copy
+    of the model and an equal share of the CPU cores. Call close() after a
+    bulk load to free the workers; the pool is recreated when next needed.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str = "torch",
+        batch_size: int = 64,
+        num_workers: Optional[int] = None
+    ):
+        self.model_name = model_name
+        self.backend = backend  # "torch" or "onnx"
+        self.batch_size = batch_size
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers if num_workers is not None else min(4, cpu_count)
+        # Split the cores between workers so their intra-op threads don't oversubscribe the CPU
+        self.threads_per_worker = max(1, cpu_count // max(1, self.num_workers))
+        self.model = _load_sentence_transformer(model_name, backend)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawn rather than fork, since the parent already has the model and its threads loaded
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.threads_per_worker)
+            )
+        return self._pool
+
+    def close(self):
+        """Shut down the worker pool and free the models it holds."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in this process, or across the worker pool for more than one batch."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        if len(texts) <= self.batch_size or self.num_workers <= 1:
+            embeddings = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        else:
+            batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+            embeddings = np.vstack(list(self._get_pool().map(_encode_in_worker, batches)))
+
+        return np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """
+    Create the embedding provider selected by the EMBEDDING_PROVIDER
+    environment variable ("openai" by default, or "local").
+    """
+    provider = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+    if provider == "openai":
+        return OpenAIEmbeddingProvider()
+    if provider == "local":
+        num_workers = os.getenv("LOCAL_EMBEDDING_WORKERS")
+        return LocalEmbeddingProvider(
+            model_name=os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+            backend=os.getenv("LOCAL_EMBEDDING_BACKEND", "torch"),
+            batch_size=int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64")),
+            num_workers=int(num_workers) if num_workers else None
+        )
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider} (expected 'openai' or 'local')")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text
+from sqlalchemy import Column, Date, Index, Integer, String, Text
 from database import Base
 
 class Document(Base):
@@ -6,4 +6,12 @@ class Document(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(Text, nullable=False)
-    content = Column(Text, nullable=False) 
\ No newline at end of file
+    content = Column(Text, nullable=False)
+    patient_id = Column(String, nullable=True)  # Indexed by the composite index below
+    encounter_date = Column(Date, nullable=True, index=True)
+    note_type = Column(String, nullable=True, index=True)
+
+    __table_args__ = (
+        # Patient-scoped queries are usually also ordered or bounded by date
+        Index("ix_documents_patient_id_encounter_date", "patient_id", "encounter_date"),
+    )
@@ -1,9 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from datetime import date
 from typing import Optional, List, Dict
 
 class DocumentBase(BaseModel):
     title: str
     content: str
+    patient_id: Optional[str] = None
+    encounter_date: Optional[date] = None
+    note_type: Optional[str] = None  # e.g. soap, discharge, radiology
 
 class DocumentCreate(DocumentBase):
     pass
@@ -18,19 +22,41 @@ class SummarizationResponse(BaseModel):
     summary: str
     error: Optional[str] = None 
 
+MAX_SEARCH_K = 100  # Upper bound on documents returned per search query
+
+class SearchFilter(BaseModel):
+    patient_id: Optional[str] = None
+    note_type: Optional[str] = None
+    encounter_date_from: Optional[date] = None  # Inclusive
+    encounter_date_to: Optional[date] = None  # Inclusive
+
 class SearchQuery(BaseModel):
     query: str
-    k: int = 3
+    k: int = Field(3, gt=0, le=MAX_SEARCH_K)
+    filters: SearchFilter = SearchFilter()
 
 class SearchResult(BaseModel):
     id: int
     title: str
     content: str
+    patient_id: Optional[str] = None
+    encounter_date: Optional[date] = None
+    note_type: Optional[str] = None
     similarity_score: float
 
+class BatchSearchQuery(BaseModel):
+    queries: List[str] = Field(..., max_length=1000)
+    k: int = Field(3, gt=0, le=MAX_SEARCH_K)
+    filters: SearchFilter = SearchFilter()
+
+class BatchSearchResult(BaseModel):
+    query: str
+    results: List[SearchResult]
+
 class QuestionRequest(BaseModel):
     question: str
-    k: int = 3  # Number of relevant documents to retrieve
+    k: int = Field(3, gt=0, le=MAX_SEARCH_K)  # Number of relevant documents to retrieve
+    filters: SearchFilter = SearchFilter()
 
 class QuestionResponse(BaseModel):
     answer: str
@@ -5,13 +5,24 @@ upload_note() {
     local file=$1
     local title=$(basename "$file" .txt)
     local content=$(cat "$file")
+    # Metadata from the note header; missing values are sent as null
+    local encounter_date=$(grep -m1 -o 'Encounter Date: [0-9]\{4\}-[0-9]\{2\}-[0-9]\{2\}' "$file" | cut -d' ' -f3)
+    local patient_id=$(grep -m1 -o 'patient--[0-9]*' "$file")
     
     curl -X POST http://localhost:8000/documents/ \
     -H "Content-Type: application/json" \
-    -d "{
-        \"title\": \"$title\",
-        \"content\": $(echo "$content" | jq -Rs .)
-    }"
+    -d "$(jq -n \
+        --arg title "$title" \
+        --arg content "$content" \
+        --arg patient_id "$patient_id" \
+        --arg encounter_date "$encounter_date" \
+        '{
+            title: $title,
+            content: $content,
+            patient_id: ($patient_id | select(. != "") // null),
+            encounter_date: ($encounter_date | select(. != "") // null),
+            note_type: "soap"
+        }')"
     echo -e "\n"
 }
 
@@ -1,79 +1,223 @@
-import os
-from typing import List, Dict
+from datetime import date
+from typing import List, Dict, Optional
 import numpy as np
 import faiss
-from openai import OpenAI
 from sqlalchemy.orm import Session
 from models import Document
-from database import get_db
+from database import engine, get_db, migrate_schema
+from embedding_service import EmbeddingProvider, get_embedding_provider
+
+# Filtered searches matching at most this many documents copy just those vectors
+# out of the index and search them directly, instead of scanning the whole index
+SUBSET_SEARCH_MAX_DOCUMENTS = 4096
+
+INDEX_BUILD_CHUNK_SIZE = 500  # Documents embedded per add_documents call when building the index at startup
 
 class VectorStore:
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-        self.client = OpenAI(api_key=self.api_key)
-        self.dimension = 1536  # OpenAI's text-embedding-3-small dimension
+    def __init__(self, embedding_provider: Optional[EmbeddingProvider] = None):
+        self.embedding_provider = embedding_provider or get_embedding_provider()
+        # Record which model and dimension the index is built with, so every
+        # vector added or searched is checked against the same embedding space
+        self.embedding_model = self.embedding_provider.model_name
+        self.dimension = self.embedding_provider.dimension
         self.index = faiss.IndexFlatL2(self.dimension)
         self.documents: List[Dict] = []  # Store document metadata
+        # Filter columns, kept alongside the index so filtered searches never scan self.documents.
+        # Positions are row numbers in self.index (and self.documents).
+        self.patient_positions: Dict[str, List[int]] = {}
+        self.note_type_positions: Dict[str, List[int]] = {}
+        self.encounter_ordinals: List[int] = []  # date.toordinal(), or -1 when unknown
+        self._filter_arrays: Dict[tuple, np.ndarray] = {}  # numpy copies of the above, rebuilt after adds
 
     def get_embedding(self, text: str) -> np.ndarray:
-        """Get embedding for a text using OpenAI's embedding model."""
-        response = self.client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return np.array(response.data[0].embedding, dtype=np.float32)
+        """Get embedding for a text using the configured embedding provider."""
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Get embeddings for several texts in one provider call."""
+        embeddings = self.embedding_provider.embed(texts)
+        if embeddings.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {embeddings.shape[1]} does not match the index, "
+                f"which was built with {self.embedding_model} ({self.dimension} dimensions)"
+            )
+        return embeddings
 
     def add_document(self, document: Document):
         """Add a document to the vector store."""
+        self.add_documents([document])
+
+    def add_documents(self, documents: List[Document]):
+        """Add several documents to the vector store, embedding them in one provider call."""
+        if not documents:
+            return
+
         # Create document text by combining title and content
-        text = f"Title: {document.title}\nContent: {document.content}"
-        
-        # Get embedding
-        embedding = self.get_embedding(text)
-        
+        texts = [f"Title: {document.title}\nContent: {document.content}" for document in documents]
+
+        # Get embeddings
+        embeddings = self.get_embeddings(texts)
+
         # Add to FAISS index
-        self.index.add(np.array([embedding]))
-        
-        # Store document metadata
-        self.documents.append({
-            "id": document.id,
-            "title": document.title,
-            "content": document.content
-        })
-
-    def search(self, query: str, k: int = 3) -> List[Dict]:
-        """Search for similar documents using a query string."""
-        # Get query embedding
-        query_embedding = self.get_embedding(query)
-        
-        # Search in FAISS index
-        distances, indices = self.index.search(np.array([query_embedding]), k)
-        
-        # Return matching documents
+        first_position = self.index.ntotal
+        self.index.add(embeddings)
+
+        for position, document in enumerate(documents, start=first_position):
+            if document.patient_id is not None:
+                self.patient_positions.setdefault(document.patient_id, []).append(position)
+            if document.note_type is not None:
+                self.note_type_positions.setdefault(document.note_type, []).append(position)
+            self.encounter_ordinals.append(
+                document.encounter_date.toordinal() if document.encounter_date is not None else -1
+            )
+
+            # Store document metadata
+            self.documents.append({
+                "id": document.id,
+                "title": document.title,
+                "content": document.content,
+                "patient_id": document.patient_id,
+                "encounter_date": document.encounter_date,
+                "note_type": document.note_type
+            })
+        self._filter_arrays.clear()
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        patient_id: Optional[str] = None,
+        note_type: Optional[str] = None,
+        encounter_date_from: Optional[date] = None,
+        encounter_date_to: Optional[date] = None
+    ) -> List[Dict]:
+        """Search for similar documents using a query string, optionally restricted by metadata."""
+        return self.search_batch(
+            [query],
+            k=k,
+            patient_id=patient_id,
+            note_type=note_type,
+            encounter_date_from=encounter_date_from,
+            encounter_date_to=encounter_date_to
+        )[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 3,
+        patient_id: Optional[str] = None,
+        note_type: Optional[str] = None,
+        encounter_date_from: Optional[date] = None,
+        encounter_date_to: Optional[date] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for similar documents for several query strings at once.
+
+        Metadata filters are applied inside the FAISS search rather than on its
+        results, so each query still gets its exact top-k among matching documents.
+        Small selections, such as one patient's notes, are copied out of the index
+        and searched directly; larger ones are passed to FAISS as an ID selector.
+        """
+        if not queries:
+            return []
+
+        # FAISS allocates k result slots per query whatever the index size, so never ask for more than exist
+        k = min(k, self.index.ntotal)
+        if k == 0:
+            return [[] for _ in queries]
+
+        selected = self._select_positions(patient_id, note_type, encounter_date_from, encounter_date_to)
+        if selected is not None and len(selected) == 0:
+            return [[] for _ in queries]
+
+        # Get all query embeddings in one request
+        query_embeddings = self.get_embeddings(queries)
+
+        # Search in FAISS with a single matrix query
+        if selected is None:
+            distances, indices = self.index.search(query_embeddings, k)
+        elif len(selected) <= SUBSET_SEARCH_MAX_DOCUMENTS:
+            vectors = self.index.reconstruct_batch(selected)
+            distances, rows = faiss.knn(query_embeddings, vectors, min(k, len(selected)))
+            indices = np.where(rows == -1, -1, selected[rows])
+        else:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(selected))
+            distances, indices = self.index.search(query_embeddings, k, params=params)
+
+        # Return matching documents for each query
         results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx != -1:  # FAISS returns -1 for empty slots
-                doc = self.documents[idx]
-                doc["similarity_score"] = float(1 / (1 + distance))  # Convert distance to similarity score
-                results.append(doc)
-        
+        for row_indices, row_distances in zip(indices, distances):
+            matches = []
+            for idx, distance in zip(row_indices, row_distances):
+                if idx != -1:  # FAISS returns -1 for empty slots
+                    doc = dict(self.documents[idx])
+                    doc["similarity_score"] = float(1 / (1 + distance))  # Convert distance to similarity score
+                    matches.append(doc)
+            results.append(matches)
+
         return results
 
+    def _select_positions(
+        self,
+        patient_id: Optional[str],
+        note_type: Optional[str],
+        encounter_date_from: Optional[date],
+        encounter_date_to: Optional[date]
+    ) -> Optional[np.ndarray]:
+        """
+        Get the sorted index positions of documents matching the filters,
+        or None when no filter is set.
+        """
+        selected = None
+        if patient_id is not None:
+            selected = self._filter_array("patient_id", patient_id, self.patient_positions.get(patient_id, []))
+        if note_type is not None:
+            positions = self._filter_array("note_type", note_type, self.note_type_positions.get(note_type, []))
+            selected = positions if selected is None else np.intersect1d(selected, positions, assume_unique=True)
+        if encounter_date_from is not None or encounter_date_to is not None:
+            ordinals = self._filter_array("encounter_date", None, self.encounter_ordinals)
+            if selected is not None:
+                ordinals = ordinals[selected]
+            mask = ordinals != -1
+            if encounter_date_from is not None:
+                mask &= ordinals >= encounter_date_from.toordinal()
+            if encounter_date_to is not None:
+                mask &= ordinals <= encounter_date_to.toordinal()
+            selected = np.flatnonzero(mask) if selected is None else selected[mask]
+        return selected
+
+    def _filter_array(self, column: str, value: Optional[str], values: List[int]) -> np.ndarray:
+        """Get a filter column as an int64 array, converting it only once between adds."""
+        if not values:
+            return np.empty(0, dtype=np.int64)
+        key = (column, value)
+        if key not in self._filter_arrays:
+            self._filter_arrays[key] = np.array(values, dtype=np.int64)
+        return self._filter_arrays[key]
+
 def initialize_vector_store():
     """Initialize the vector store with all documents from the database."""
     vector_store = VectorStore()
+
+    # Make sure the metadata columns exist before reading documents
+    migrate_schema(engine)
     
     # Get database session
     db = next(get_db())
     
     # Get all documents
-    documents = db.query(Document).all()
+    documents = db.query(Document).order_by(Document.id).all()
     
-    # Add each document to the vector store
-    for doc in documents:
-        vector_store.add_document(doc)
+    # Add documents to the vector store in chunks, so a failed chunk doesn't lose the rest of the build
+    for start in range(0, len(documents), INDEX_BUILD_CHUNK_SIZE):
+        chunk = documents[start:start + INDEX_BUILD_CHUNK_SIZE]
+        try:
+            vector_store.add_documents(chunk)
+        except Exception as e:
+            print(f"Error indexing documents {chunk[0].id}-{chunk[-1].id}: {str(e)}")
+
+    # Free the resources used for the bulk load, such as local embedding workers
+    vector_store.embedding_provider.close()
     
     return vector_store
 